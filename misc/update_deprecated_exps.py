@@ -9,101 +9,533 @@ There are two types of "old" logs:
 Both logs styles are converted to the current logging format, and the last checkpoint
 is re-evaluated.
 
-NOTE: This module requires tensorflow to parse the tensorboard files.
+NOTE: The tensorboard files are read directly (without tensorflow), but the event
+protos are decoded with the definitions that ship with tensorboardX.
 """
 import os
 import time
 import json
+import errno
+import mmap
+import struct
 import argparse
 import logging
 import shutil
-import numpy as np
-from pathlib import Path
-from test_matching import evaluation
-from logger import setup_logging
-from parse_config import ConfigParser
+import multiprocessing
+import importlib.util
+
+
+def _prefer_cpp_protobuf():
+    """Decode protos with the C++ implementation of protobuf where it is available
+    (it is much faster than the pure python one). This has to be done before
+    google.protobuf is first used (e.g. by tensorboardX), so it happens at import
+    time. Newer releases that ship the upb backend instead are left untouched."""
+    try:
+        cpp_ext = importlib.util.find_spec("google.protobuf.pyext._message")
+    except ImportError:
+        return
+    if cpp_ext is not None:
+        os.environ.setdefault("PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION", "cpp")
+
+
+_prefer_cpp_protobuf()
+import torch  # NOQA
+from tensorboardX.proto.event_pb2 import Event  # NOQA
+from pathlib import Path  # NOQA
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor  # NOQA
+from test_matching import evaluation  # NOQA
+from logger import setup_logging  # NOQA
+from parse_config import ConfigParser  # NOQA
+try:
+    from google_crc32c import value as _hw_crc32c
+except ImportError:
+    _hw_crc32c = None
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
+# errors raised by the in-kernel copy routines when the source/destination pairing is
+# not supported (e.g. cross-filesystem copies on older kernels, or `os.sendfile` on
+# macOS/BSD, which can only write to sockets), in which case we fall back to the next
+# strategy
+FALLBACK_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP,
+                   errno.ENOTSUP, errno.ENOTSOCK}
+COPY_BUFSIZE = 1 << 20
+# the device claimed by an evaluation worker process (see _init_eval_worker)
+WORKER_DEVICE = None
+
+
+# Each copy strategy returns the number of bytes that it copied, which can fall short of
+# `size` if the kernel gives up part-way (e.g. some filesystems report 0 bytes copied
+# rather than raising an error).
+def _copy_file_range(src_fd, dst_fd, size):
+    copied = 0
+    while copied < size:
+        num_copied = os.copy_file_range(src_fd, dst_fd, size - copied)
+        if num_copied == 0:
+            break
+        copied += num_copied
+    return copied
+
+
+def _sendfile(src_fd, dst_fd, size):
+    copied = 0
+    while copied < size:
+        num_sent = os.sendfile(dst_fd, src_fd, copied, size - copied)
+        if num_sent == 0:
+            break
+        copied += num_sent
+    return copied
+
+
+def _readinto(src_fd, dst_fd, size):
+    buf = bytearray(COPY_BUFSIZE)
+    view = memoryview(buf)
+    copied = 0
+    with open(src_fd, "rb", buffering=0, closefd=False) as f:
+        while True:
+            num_read = f.readinto(buf)
+            if not num_read:
+                break
+            pending = view[:num_read]
+            while pending:
+                pending = pending[os.write(dst_fd, pending):]
+            copied += num_read
+    return copied
+
+
+def _fastcopy(src, dst, drop_cache=False):
+    """Copy the contents of `src` to `dst`, keeping the data in the kernel if possible.
+
+    Args:
+        src (str|Path): path to the source file
+        dst (str|Path): path to the destination file (truncated if it exists)
+        drop_cache (bool): if true, advise the kernel that the pages of the destination
+            are no longer needed once the copy has completed (useful for large
+            checkpoints, which would otherwise evict more useful data from the page
+            cache). The source is left alone, since it may still be read by others
+            (e.g. the evaluation that runs alongside the checkpoint copy).
+
+    NOTE: `os.copy_file_range` is tried first (it can be served as a server-side clone
+    on NFS/btrfs), followed by `os.sendfile` and finally a plain userspace loop with a
+    1 MiB buffer.
+    """
+    strategies = [_sendfile, _readinto]
+    if hasattr(os, "copy_file_range"):
+        strategies.insert(0, _copy_file_range)
+    src_fd = os.open(str(src), os.O_RDONLY)
+    try:
+        src_stat = os.fstat(src_fd)
+        size = src_stat.st_size
+        # opening `dst` truncates it, so (as with shutil.copyfile) a copy of a file onto
+        # itself must be refused before then
+        try:
+            dst_stat = os.stat(str(dst))
+        except FileNotFoundError:
+            pass
+        else:
+            if (src_stat.st_dev, src_stat.st_ino) == (dst_stat.st_dev, dst_stat.st_ino):
+                raise shutil.SameFileError(f"{src} and {dst} are the same file")
+        dst_fd = os.open(str(dst), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+        try:
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(src_fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            for strategy in strategies:
+                try:
+                    copied = strategy(src_fd, dst_fd, size)
+                except OSError as err:
+                    if err.errno not in FALLBACK_ERRNOS or strategy is _readinto:
+                        raise
+                    copied = None
+                if copied == size:
+                    break
+                if strategy is _readinto:
+                    msg = f"copied {copied} of {size} bytes from {src} to {dst}"
+                    raise IOError(msg)
+                # discard any partial progress before trying the next strategy
+                os.lseek(src_fd, 0, os.SEEK_SET)
+                os.lseek(dst_fd, 0, os.SEEK_SET)
+                os.ftruncate(dst_fd, 0)
+            if drop_cache and hasattr(os, "posix_fadvise"):
+                os.fdatasync(dst_fd)
+                os.posix_fadvise(dst_fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(dst_fd)
+    finally:
+        os.close(src_fd)
+
+
+# payload checksums are only verified on request, since they dominate the parsing time
+# when google-crc32c is not installed (the length checksums are always verified)
+VERIFY_PAYLOADS = os.environ.get("PARSE_TFEVENTS_VERIFY", "0") == "1"
+
+
+def _crc32c_table():
+    table = []
+    for crc in range(256):
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0x82F63B78 if crc & 1 else crc >> 1
+        table.append(crc)
+    return table
+
+
+CRC32C_TABLE = _crc32c_table()
+
+
+class DataLossError(IOError):
+    """Raised when a tensorboard event file is truncated or corrupted."""
+
+
+def _crc32c(buf):
+    if _hw_crc32c is not None:
+        return _hw_crc32c(bytes(buf))
+    crc = 0xFFFFFFFF
+    for byte in bytes(buf):
+        crc = CRC32C_TABLE[(crc ^ byte) & 0xFF] ^ (crc >> 8)
+    return crc ^ 0xFFFFFFFF
+
+
+def _masked_crc(buf):
+    """Compute the masked CRC32C checksum used by the tensorboard record format."""
+    crc = _crc32c(buf)
+    return (((crc >> 15) | (crc << 17)) + 0xA282EAD8) & 0xFFFFFFFF
+
+
+def _iter_tfevents(path, verify_payloads=VERIFY_PAYLOADS):
+    """Iterate over the `Event` protos stored in a tensorboard event file.
+
+    Args:
+        path (str|Path): location of the `events.out.tfevents.*` file
+        verify_payloads (bool): whether to check the payload checksum of each record
+            (the length checksum is always checked).
+
+    Returns:
+        (generator) decoded `Event` protos, in the order they were written
+
+    NOTE: Each record is framed as `uint64 length, uint32 masked crc of length,
+    payload, uint32 masked crc of payload` (little-endian). If the file ends
+    part-way through a record (e.g. the job was killed while writing), or a checksum
+    does not match, a DataLossError is raised after yielding all the valid records.
+    """
+    size = os.stat(str(path)).st_size
+    if not size:
+        return
+    # The file is memory-mapped so that payloads can be handed to the proto parser as
+    # views, without first being copied into a bytes object.
+    with open(str(path), "rb") as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, \
+            memoryview(mm) as buf:
+        offset = 0
+        while offset < size:
+            msg = f"truncated record at byte {offset} of {path}"
+            if offset + 12 > size:
+                raise DataLossError(msg)
+            length, length_crc = struct.unpack_from("<QI", mm, offset)
+            if _masked_crc(mm[offset:offset + 8]) != length_crc:
+                msg = f"corrupted record length at byte {offset} of {path}"
+                raise DataLossError(msg)
+            start, end = offset + 12, offset + 12 + length
+            if end + 4 > size:
+                raise DataLossError(msg)
+            payload_crc, = struct.unpack_from("<I", mm, end)
+            # the view must be released before the map can be closed
+            payload = buf[start:end]
+            try:
+                if verify_payloads and _masked_crc(payload) != payload_crc:
+                    raise DataLossError(f"corrupted record at byte {offset} of {path}")
+                event = Event()
+                event.ParseFromString(payload)
+            finally:
+                payload.release()
+            offset = end + 4
+            yield event
 
 
 def parse_tboard_files(rel_dir):
-    import tensorflow as tf
-    from protobuf_to_dict import protobuf_to_dict
-    tboard_files = list(Path(rel_dir).glob("events.out.tfevents.*"))
+    with os.scandir(rel_dir) as it:
+        tboard_files = [x.name for x in it if x.name.startswith("events.out.tfevents.")]
     assert len(tboard_files) == 1, "expected a single tensorboard file"
-    tboard_file_path = tboard_files[0]
-    gen_log = [f"This log was generated from tensorboard file {tboard_file_path.name}"]
+    tboard_file_path = Path(rel_dir) / tboard_files[0]
+    header = f"This log was generated from tensorboard file {tboard_file_path.name}"
+    records = []
     count = 0
     try:
-        for summary in tf.train.summary_iterator(str(tboard_file_path)):
+        for event in _iter_tfevents(tboard_file_path):
             count += 1
-            summary = protobuf_to_dict(summary)
             if count > 1000:
                 break
-            if "step" not in summary:
+            if not event.HasField("summary"):
+                continue
+            value = event.summary.value
+            if not value:
                 continue
-            step = summary["step"]
-            ts = time.strftime('%Y-%m-%d:%Hh%Mm%Ss', time.gmtime(summary["wall_time"]))
-            if "summary" in summary and summary["summary"]["value"]:
-                value = summary["summary"]["value"]
-                if "simple_value" in value[0]:
-                    vals = [f"{x['tag']}: {x['simple_value']}" for x in value]
-                    if step % 2000 == 0 or value[0]["tag"] != "train/loss":
-                        row = f"{ts} step: {step}, {','.join(vals)}"
-                        gen_log.append(row)
-                        print(row)
-                elif "image" in value[0]:
-                    pass
-                else:
-                    import ipdb; ipdb.set_trace()
-    except tf.errors.DataLossError as DLE:
-        print(f"{DLE} Could not parse any further information")
+            # other summaries (images, histograms etc.) are not included in the text logs
+            if value[0].WhichOneof("value") == "simple_value":
+                # only the (frequent) training loss summaries are subsampled, so we
+                # filter on the proto fields before doing any formatting
+                step = event.step
+                if step % 2000 and value[0].tag == "train/loss":
+                    continue
+                vals = [(x.tag, x.simple_value) for x in value]
+                records.append((event.wall_time, step, vals))
+    except DataLossError as err:
+        print(f"{err} Could not parse any further information")
     print(f"parsed {count} summaries")
+    # the rows are echoed to the console when they are logged, so they are not printed
+    gen_log = [header]
+    for wall_time, step, vals in records:
+        ts = time.strftime('%Y-%m-%d:%Hh%Mm%Ss', time.gmtime(wall_time))
+        vals = ",".join(f"{tag}: {simple_value}" for tag, simple_value in vals)
+        gen_log.append(f"{ts} step: {step}, {vals}")
     return gen_log
 
 
-def modernize_exp_dir(experiments, checkpoints, save_dir, refresh):
-    for key in experiments:
-        rel_dir = checkpoints[key]["timestamp"]
+# bump this to invalidate all existing run summaries (e.g. if the evaluation changes)
+RUN_SUMMARY_SCHEMA = 1
 
-        timestamp = rel_dir.split("/")[-1]
-        src_config = Path(rel_dir) / "config.json"
-        src_model = Path(rel_dir) / "model_best.pth"
-        dest_log = Path(save_dir) / "log" / key / timestamp / "info.log"
-        config_path = Path(save_dir) / "models" / key / timestamp / "config.json"
-        model_path = Path(save_dir) / "models" / key / timestamp / "model_best.pth"
 
-        config_path.parent.mkdir(exist_ok=True, parents=True)
-        if not config_path.exists() or refresh:
-            print(f"copying config: {str(src_config)} -> {str(config_path)}")
-            shutil.copyfile(str(src_config), str(config_path))
-        else:
-            print(f"transferred config found at {str(config_path)}, skipping...")
+def _load_run_summary(summary_path, ckpt_path):
+    """Load the summary of a previous run, if it is still valid.
 
+    Args:
+        summary_path (Path): location of the `run_summary.json` file
+        ckpt_path (Path): the checkpoint that was evaluated to produce the summary
 
-        if not model_path.exists() or refresh:
-            print(f"copying model: {str(src_model)} -> {str(model_path)}")
-            shutil.copyfile(str(src_model), str(model_path))
-        else:
-            print(f"transferred model found at {str(model_path)}, skipping...")
-
-        if not dest_log.exists() or refresh:
-            generated_log = parse_tboard_files(rel_dir)
-            dest_log.parent.mkdir(exist_ok=True, parents=True)
-            setup_logging(save_dir=dest_log.parent)
-            logger = logging.getLogger("tboard-parser")
-            for row in generated_log:
-                logger.info(row)
-
-            # re-run pixel matching evaluation
-            best_ckpt_path = Path(rel_dir) / "model_best.pth"
-            eval_args = argparse.ArgumentParser()
-            eval_args.add_argument("--config", default=str(config_path))
-            eval_args.add_argument("--device", default="0")
-            eval_args.add_argument("--mini_eval", default=1)
-            eval_args.add_argument("--resume", default=best_ckpt_path)
-            eval_config = ConfigParser(eval_args, slave_mode=True)
-            evaluation(eval_config, logger=logger)
-        else:
-            print(f"generated log found at {str(dest_log)}, skipping...")
+    Returns:
+        (dict|None) the summary, or None if it is missing, was written with a different
+        schema, or the checkpoint has changed since it was written.
+    """
+    try:
+        with open(str(summary_path), "rb") as f:
+            summary = json_loads(f.read())
+        ckpt_stat = os.stat(str(ckpt_path))
+    except (FileNotFoundError, ValueError):
+        return None
+    if summary.get("schema") != RUN_SUMMARY_SCHEMA:
+        return None
+    ckpt_id = (ckpt_stat.st_mtime, ckpt_stat.st_size)
+    if (summary.get("ckpt_mtime"), summary.get("ckpt_size")) != ckpt_id:
+        return None
+    return summary
+
+
+def _run_summary_status(summary_path, ckpt_path, outputs):
+    """Check the run summary of an experiment to decide what needs to be redone.
+
+    Args:
+        summary_path (Path): location of the `run_summary.json` file
+        ckpt_path (Path): the checkpoint that was evaluated to produce the summary
+        outputs (List[Path]): the files produced for the experiment
+
+    Returns:
+        (str) "skip" if the summary is valid and all of the outputs exist, "refresh" if
+        a summary exists but is out of date (so everything must be regenerated), or
+        "check" if the outputs should be checked individually.
+    """
+    if _load_run_summary(summary_path, ckpt_path):
+        if all(_exists(str(x)) for x in outputs):
+            print(f"run summary found at {str(summary_path)}, skipping...")
+            return "skip"
+        print(f"run summary found at {str(summary_path)}, but outputs are missing")
+        return "check"
+    if _exists(str(summary_path)):
+        print(f"run summary at {str(summary_path)} is out of date, refreshing...")
+        return "refresh"
+    return "check"
+
+
+def _remove(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _write_run_summary(summary_path, ckpt_path, metrics):
+    ckpt_stat = os.stat(str(ckpt_path))
+    summary = {
+        "schema": RUN_SUMMARY_SCHEMA,
+        "ckpt_mtime": ckpt_stat.st_mtime,
+        "ckpt_size": ckpt_stat.st_size,
+        "metrics": metrics,
+    }
+    with open(str(summary_path), "w") as f:
+        json.dump(summary, f, indent=4)
+
+
+def _exists(path):
+    """Check whether `path` exists with a single stat call."""
+    try:
+        os.stat(path)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def _init_eval_worker(devices):
+    """Claim a single device (for the lifetime of the worker process) from the queue
+    of available devices, and create the CUDA context once, up front, so that it is
+    shared by all of the evaluations run by the worker."""
+    global WORKER_DEVICE
+    WORKER_DEVICE = devices.get()
+    os.environ["CUDA_VISIBLE_DEVICES"] = WORKER_DEVICE
+    if torch.cuda.is_available():
+        torch.cuda.init()
+
+
+def _run_on_worker_device(process_fn, key, **kwargs):
+    return process_fn(key, device=WORKER_DEVICE, **kwargs)
+
+
+def _process_exps(process_fn, experiments, devices, **kwargs):
+    """Run `process_fn` on each experiment. When multiple devices are given, the
+    experiments are distributed across a pool with one worker process per device.
+    """
+    if not experiments:
+        return
+    if len(devices) == 1:
+        for key in experiments:
+            process_fn(key, device=devices[0], **kwargs)
+        return
+
+    num_workers = min(len(experiments), len(devices))
+    device_queue = multiprocessing.Queue()
+    for device in devices[:num_workers]:
+        device_queue.put(device)
+    with ProcessPoolExecutor(
+        max_workers=num_workers,
+        initializer=_init_eval_worker,
+        initargs=(device_queue,),
+    ) as executor:
+        futures = [executor.submit(_run_on_worker_device, process_fn, key, **kwargs)
+                   for key in experiments]
+        for future in futures:
+            future.result()
+
+
+def _log_rows(logger, rows):
+    """Log each row as a separate INFO record (so that every row gets the usual
+    timestamp prefix in info.log). The records for the `info_file_handler` set up by
+    logger/logger_config.json are written to the log file with a single write and flush,
+    rather than one per row, so the check for rollover is only made once per batch (the
+    generated logs are tiny compared with `maxBytes`). The other handlers of the root
+    logger (e.g. the console) handle the records one at a time as usual.
+
+    Args:
+        logger (logging.Logger): the logger that the rows are attributed to
+        rows (List[str]): the messages to be logged
+    """
+    root = logging.getLogger()
+    file_handler = next((x for x in root.handlers if x.name == "info_file_handler"),
+                        None)
+    if file_handler is None or not logger.isEnabledFor(logging.INFO):
+        for row in rows:
+            logger.info(row)
+        return
+    fn, lno, func, _ = logger.findCaller()
+    records = [logger.makeRecord(logger.name, logging.INFO, fn, lno, row, None, None,
+                                 func=func) for row in rows]
+    records = [x for x in records if logger.filter(x)]
+    for handler in root.handlers:
+        if handler is not file_handler:
+            for record in records:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+    batch = [x for x in records
+             if x.levelno >= file_handler.level and file_handler.filter(x)]
+    if not batch:
+        return
+    with file_handler.lock:
+        try:
+            if file_handler.shouldRollover(batch[0]):
+                file_handler.doRollover()
+            file_handler.stream.write("".join(file_handler.format(x)
+                                              + file_handler.terminator for x in batch))
+            file_handler.flush()
+        except Exception:
+            file_handler.handleError(batch[0])
+
+
+def _evaluate(config_path, ckpt_path, device, logger):
+    """Re-run the pixel matching evaluation for a checkpoint."""
+    eval_args = argparse.ArgumentParser()
+    eval_args.add_argument("--config", default=str(config_path))
+    eval_args.add_argument("--device", default=device)
+    eval_args.add_argument("--mini_eval", default=1)
+    eval_args.add_argument("--resume", default=ckpt_path)
+    eval_config = ConfigParser(eval_args, slave_mode=True)
+    return evaluation(eval_config, logger=logger)
+
+
+def _modernize_exp(key, checkpoints, save_dir, refresh, device):
+    rel_dir = checkpoints[key]["timestamp"]
+
+    timestamp = rel_dir.split("/")[-1]
+    src_config = Path(rel_dir) / "config.json"
+    src_model = Path(rel_dir) / "model_best.pth"
+    dest_log = Path(save_dir) / "log" / key / timestamp / "info.log"
+    config_path = Path(save_dir) / "models" / key / timestamp / "config.json"
+    model_path = Path(save_dir) / "models" / key / timestamp / "model_best.pth"
+    summary_path = config_path.parent / "run_summary.json"
+
+    if not refresh:
+        outputs = [config_path, model_path, dest_log]
+        status = _run_summary_status(summary_path, src_model, outputs)
+        if status == "skip":
+            return
+        refresh = status == "refresh"
+
+    os.makedirs(str(config_path.parent), exist_ok=True)
+    if refresh or not _exists(str(config_path)):
+        print(f"copying config: {str(src_config)} -> {str(config_path)}")
+        _fastcopy(src_config, config_path)
+    else:
+        print(f"transferred config found at {str(config_path)}, skipping...")
+
+
+    # The model copy is I/O bound and nothing else reads from the destination, so it
+    # runs in the background while the event file is parsed and the checkpoint is
+    # evaluated (evaluation reads from the source checkpoint).
+    copier = ThreadPoolExecutor(max_workers=1)
+    model_copy = None
+    if refresh or not _exists(str(model_path)):
+        print(f"copying model: {str(src_model)} -> {str(model_path)}")
+        model_copy = copier.submit(_fastcopy, src_model, model_path, drop_cache=True)
+    else:
+        print(f"transferred model found at {str(model_path)}, skipping...")
+    copier.shutdown(wait=False)
+
+    if refresh or not _exists(str(dest_log)):
+        generated_log = parse_tboard_files(rel_dir)
+        os.makedirs(str(dest_log.parent), exist_ok=True)
+        # the file handler appends, so remove any previously generated log
+        _remove(str(dest_log))
+        setup_logging(save_dir=dest_log.parent)
+        logger = logging.getLogger("tboard-parser")
+        _log_rows(logger, generated_log)
+
+        # re-run pixel matching evaluation
+        metrics = _evaluate(config_path, src_model, device=device, logger=logger)
+    else:
+        print(f"generated log found at {str(dest_log)}, skipping...")
+        metrics = None
+
+    if model_copy is not None:
+        model_copy.result()
+    if metrics is not None:
+        _write_run_summary(summary_path, src_model, metrics)
+
+
+def modernize_exp_dir(experiments, checkpoints, save_dir, refresh, devices=("0",)):
+    _process_exps(
+        _modernize_exp,
+        experiments=experiments,
+        devices=devices,
+        checkpoints=checkpoints,
+        save_dir=save_dir,
+        refresh=refresh,
+    )
 
 
 def parse_old_log(log_path, config_path, fixed_epochs):
@@ -112,14 +544,24 @@ def parse_old_log(log_path, config_path, fixed_epochs):
     reference the 'excess' consists of 5 or 6 epochs of training after the planned 100.
     The checkpoints generated by these additional checkpoints are discarded, rather than
     evaluated."""
-    with open(config_path, "r") as f:
-        config = f.read().splitlines()
-    with open(log_path, "r") as f:
-        log = f.read().splitlines()
+    config = Path(config_path).read_text().splitlines()
+    text = Path(log_path).read_text()
     tag = f"checkpoint-epoch{fixed_epochs}.pth"
-    presence = [(tag in row and "trainer" in row) for row in log]
-    assert sum(presence) == 1, "expected single occurence of log tag"
-    pos = np.where(presence)[0].item()
+    # search the raw text for the (few) occurrences of the tag, rather than every row
+    matches = []
+    idx = text.find(tag)
+    while idx != -1:
+        row_start = text.rfind("\n", 0, idx) + 1
+        row_end = text.find("\n", idx)
+        row_end = len(text) if row_end == -1 else row_end
+        if "trainer" in text[row_start:row_end]:
+            matches.append(row_start)
+        idx = text.find(tag, row_end)
+    assert len(matches) == 1, "expected single occurence of log tag"
+    # rows are split on "\n" only, so that they line up with the newline count (note
+    # that splitlines() would also break on e.g. form feeds)
+    pos = text.count("\n", 0, matches[0])
+    log = text.split("\n")
     timestamp = Path(log_path).parent.stem
     gen_log = [f"This log was generated from an existing log for experiemnt {timestamp}"]
     gen_log += ["Launching experiment with config:"]
@@ -127,44 +569,65 @@ def parse_old_log(log_path, config_path, fixed_epochs):
     return gen_log + config + log[:pos + 1 + offset]
 
 
-def standardize_exp_dir(experiments, save_dir, checkpoints, refresh):
+def _standardize_exp(key, checkpoints, save_dir, refresh, device):
+    timestamp = checkpoints[key]["timestamp"]
+    epoch = checkpoints[key]["epoch"]
+
+    log_path = Path(save_dir) / "log" / key / timestamp / "info.log"
+    config_path = Path(save_dir) / "models" / key / timestamp / "config.json"
+    ckpt_name = f"checkpoint-epoch{epoch}.pth"
+    model_path = Path(save_dir) / "models" / key / timestamp / ckpt_name
+    summary_path = config_path.parent / "run_summary.json"
+    # The original log is moved aside as a backup (a rename, so no data is copied) and
+    # the log is regenerated in its place. If a previous run has already done this,
+    # the backup holds the original log, so the log is regenerated from there.
+    backup_log = f"{str(log_path)}.backup"
+
+    if not refresh:
+        outputs = [log_path, Path(backup_log)]
+        status = _run_summary_status(summary_path, model_path, outputs)
+        if status == "skip":
+            return
+        refresh = status == "refresh"
+
+    has_backup = _exists(backup_log)
+
+    assert has_backup or _exists(str(log_path)), "log was not found"
+    assert _exists(str(config_path)), "config was not found"
+    assert _exists(str(model_path)), "model was not found"
+
+    if refresh or not has_backup or not _exists(str(log_path)):
+        src_log = backup_log if has_backup else str(log_path)
+        generated_log = parse_old_log(src_log, config_path, epoch)
+        # the original is only moved once it has been parsed successfully, so that it
+        # is still in place for the next attempt if parsing fails
+        if has_backup:
+            _remove(str(log_path))
+        else:
+            os.rename(str(log_path), backup_log)
+        setup_logging(save_dir=log_path.parent)
+        logger = logging.getLogger("log-gen")
+        _log_rows(logger, generated_log)
+
+        # re-run pixel matching evaluation (this was missing in the old format)
+        metrics = _evaluate(config_path, model_path, device=device, logger=logger)
+        _write_run_summary(summary_path, model_path, metrics)
+    else:
+        print(f"backup log found at {str(backup_log)}, skipping...")
+
+
+def standardize_exp_dir(experiments, save_dir, checkpoints, refresh, devices=("3",)):
     """Restructure logs in canonical format (deals with older versions that were
     run different config setups).
     """
-    for key in experiments:
-        timestamp = checkpoints[key]["timestamp"]
-        epoch = checkpoints[key]["epoch"]
-
-        log_path = Path(save_dir) / "log" / key / timestamp / "info.log"
-        config_path = Path(save_dir) / "models" / key / timestamp / "config.json"
-        ckpt_name = f"checkpoint-epoch{epoch}.pth"
-        model_path = Path(save_dir) / "models" / key / timestamp / ckpt_name
-        assert log_path.exists(), "log was not found"
-        assert config_path.exists(), "config was not found"
-        assert model_path.exists(), "model was not found"
-
-        # make a backup to preserve the original
-        backup_log = f"{str(log_path)}.backup"
-
-        if not Path(backup_log).exists() or refresh:
-            shutil.copyfile(str(log_path), backup_log)
-            generated_log = parse_old_log(backup_log, config_path, epoch)
-            log_path.unlink()
-            setup_logging(save_dir=log_path.parent)
-            logger = logging.getLogger("log-gen")
-            for row in generated_log:
-                logger.info(row)
-
-            # re-run pixel matching evaluation (this was missing in the old format)
-            eval_args = argparse.ArgumentParser()
-            eval_args.add_argument("--config", default=str(config_path))
-            eval_args.add_argument("--device", default="3")
-            eval_args.add_argument("--mini_eval", default=1)
-            eval_args.add_argument("--resume", default=model_path)
-            eval_config = ConfigParser(eval_args, slave_mode=True)
-            evaluation(eval_config, logger=logger)
-        else:
-            print(f"backup log found at {str(backup_log)}, skipping...")
+    _process_exps(
+        _standardize_exp,
+        experiments=experiments,
+        devices=devices,
+        checkpoints=checkpoints,
+        save_dir=save_dir,
+        refresh=refresh,
+    )
 
 
 if __name__ == "__main__":
@@ -173,6 +636,8 @@ if __name__ == "__main__":
     parser.add_argument("--refresh", action="store_true")
     parser.add_argument("--save_dir", default="data/saved")
     parser.add_argument("--device", default="")
+    # comma separated list of the devices used for evaluation (one worker per device)
+    parser.add_argument("--eval_devices", default="")
     parser.add_argument("--dep_exps", default="misc/experiments-deprecated.json")
     parser.add_argument("--non_std_exps", default="misc/experiments-non-standard.json")
     parser.add_argument("--ckpts_path", default="misc/server-checkpoints.json")
@@ -181,24 +646,30 @@ if __name__ == "__main__":
     if args.device:
         os.environ["CUDA_VISIBLE_DEVICES"] = args.device
 
-    with open(args.ckpts_path, "r") as f:
-        ckpts = json.load(f)
+    with open(args.ckpts_path, "rb") as f:
+        ckpts = json_loads(f.read())
+
+    kwargs = {}
+    if args.eval_devices:
+        kwargs["devices"] = args.eval_devices.split(",")
 
     if args.task == "modernize":
-        with open(args.dep_exps, "r") as f:
-            dep_experiments = json.load(f)
+        with open(args.dep_exps, "rb") as f:
+            dep_experiments = json_loads(f.read())
         modernize_exp_dir(
             refresh=args.refresh,
             checkpoints=ckpts,
             save_dir=args.save_dir,
             experiments=dep_experiments,
+            **kwargs,
         )
     elif args.task == "standardize":
-        with open(args.non_std_exps, "r") as f:
-            non_std_experiments = json.load(f)
+        with open(args.non_std_exps, "rb") as f:
+            non_std_experiments = json_loads(f.read())
         standardize_exp_dir(
             refresh=args.refresh,
             checkpoints=ckpts,
             save_dir=args.save_dir,
             experiments=non_std_experiments,
+            **kwargs,
         )
\ No newline at end of file
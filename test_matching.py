@@ -331,9 +331,14 @@ def evaluation(config, logger=None, eval_data=None):
                 fig.savefig('/tmp/matching.pdf')
 
     print("")  # cleanup print from tqdm subtraction
+    metrics = {
+        "same_err": float(np.mean(same_errs)),
+        "diff_err": float(np.mean(diff_errs)),
+    }
     logger.info("Matching Metrics:")
-    logger.info(f"Mean Pixel Error (same-identity): {np.mean(same_errs)}")
-    logger.info(f"Mean Pixel Error (different-identity) {np.mean(diff_errs)}")
+    logger.info(f"Mean Pixel Error (same-identity): {metrics['same_err']}")
+    logger.info(f"Mean Pixel Error (different-identity) {metrics['diff_err']}")
+    return metrics
 
 
 if __name__ == '__main__':